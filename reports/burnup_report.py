@@ -1,17 +1,15 @@
 import datetime
-import json
+import functools
 import logging
-import time
 from os import path, makedirs
 
-import numpy as np
-import pandas as pd
-from pandas.plotting import register_matplotlib_converters
-register_matplotlib_converters()
+import orjson
 import requests
-from matplotlib import dates as mdates
-from matplotlib import pyplot as plt
-from matplotlib import ticker as ticker
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# numpy, pandas and matplotlib are slow to import, so they're only imported
+# inside the functions that need them (see configure_plotting)
 
 # Configuring logging
 mpl_logger = logging.getLogger("matplotlib")  # Setting matplotlib logging to only log warnings and up
@@ -19,17 +17,35 @@ mpl_logger.setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Burnup history is stored as one JSON record per line so daily updates only append
+BURNUP_DATA_FILE = "burnup_data.jsonl"
+LEGACY_BURNUP_DATA_FILE = "burnup_data.json"
+
+# Shared session so the TLS connection to Trello is reused between calls,
+# retrying with backoff when Trello rate limits or has a transient server error
+REQUEST_TIMEOUT = 10  # In seconds
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+))
+
 
 def generate_burnup_chart(board_id, app_key, user_token, save_loc, board_name, regression_amount):
     # Getting data
     logger.info("Getting tasks done/scope")
-    curr_cards_done = get_cards_done(board_id, app_key, user_token, board_name)
-    curr_cards_total = get_cards_total(board_id, app_key, user_token)
+    curr_cards_done, curr_cards_total = fetch_board_snapshot(board_id, app_key, user_token, board_name)
     timestamp = get_timestamp()
 
-    # Saving new data to burnup_data.json
-    logger.info("Updating burnup_data.json with fetched data")
-    update_burnup_data(curr_cards_done, curr_cards_total, timestamp)
+    # Saving new data to burnup_data.jsonl
+    logger.info("Updating %s with fetched data" % BURNUP_DATA_FILE)
+    data_changed = update_burnup_data(curr_cards_done, curr_cards_total, timestamp)
+
+    # Skipping the render if today's chart already shows this exact data
+    if not data_changed and path.exists(get_burnup_save_loc(save_loc, timestamp)):
+        logger.info("Burnup data unchanged since the last run today, skipping chart render")
+        return
 
     # Getting chart stats
     logger.info("Calculating burnup stats")
@@ -37,66 +53,78 @@ def generate_burnup_chart(board_id, app_key, user_token, save_loc, board_name, r
 
     # Creating/saving chart
     logger.info("Rendering and saving burnup chart at %s" % save_loc)
-    render_burnup_chart(burnup_stats, save_loc, regression_amount)
+    render_burnup_chart(burnup_stats, save_loc, regression_amount, timestamp)
 
 
 def get_timestamp():
     """Returns the current date as a string formatted YYYY-MM-DD"""
 
-    timestamp = datetime.datetime.fromtimestamp(time.time()).strftime('%Y-%m-%d')
+    timestamp = datetime.date.today().isoformat()
     return timestamp
 
 
-def get_cards_done(board_id, app_key, user_token, board_name):
-    """Fetches and returns the number of cards in the Trello list under the passed name"""
+def fetch_board_snapshot(board_id, app_key, user_token, board_name):
+    """
+    Fetches every list on the Trello board (with their cards) in a single request.
+    Returns a tuple of the number of cards in the list under the passed name and
+    the total number of cards on the board.
+    """
 
-    # Constructing GET request to get all lists on the board
-    url = "https://api.trello.com/1/boards/%s/lists?cards=all&key=%s&token=%s" % (board_id, app_key, user_token)
+    # Constructing GET request to get all lists on the board, letting requests encode the query
+    url = "https://api.trello.com/1/boards/%s/lists" % board_id
+    params = {
+        "cards": "all",
+        "key": app_key,
+        "token": user_token
+    }
 
     # Performing GET and parsing to JSON
-    response = requests.request("GET", url)
-    resp = json.loads(response.text)
+    resp = session.get(url, params=params, timeout=REQUEST_TIMEOUT).json()
 
     # Searching for list named "Done"
-    done_list = None
-    for board in resp:
-        if board["name"] == board_name:
-            done_list = board
-
-    # Returning length of the cards list within the board named "Done"
-    return len(done_list["cards"])
+    done_list = next((board for board in resp if board["name"] == board_name), None)
+    if done_list is None:
+        raise ValueError("No list named '%s' found on the Trello board." % board_name)
 
+    # Counting the cards within the "Done" list and across every list on the board
+    cards_done = len(done_list["cards"])
+    cards_total = sum(len(board["cards"]) for board in resp)
 
-def get_cards_total(board_id, app_key, user_token):
-    """Fetches and returns the number of total cards within the Trello board"""
+    return cards_done, cards_total
 
-    # Constructing GET request to get all cards
-    url = "https://api.trello.com/1/boards/%s/cards?key=%s&token=%s" % (board_id, app_key, user_token)
 
-    response = requests.request("GET", url)
-    resp = json.loads(response.text)
+def get_burnup_save_loc(save_loc, timestamp):
+    """Returns the file path of the burnup chart image for the given date"""
 
-    return len(resp)
+    return path.join(save_loc, 'burnup-%s.png' % timestamp)
 
 
 def update_burnup_data(cards_done, cards_total, timestamp):
-    """Updates burnup_data.json with new burnup data"""
+    """
+    Appends a new burnup data record to burnup_data.jsonl.
+    Returns False without writing anything if the last record already holds the same
+    data for the same date, otherwise returns True.
+    """
 
-    # Loading burnup data
-    burnup_data = load_burnup_data()
+    # Carrying over any history from the old burnup_data.json store
+    migrate_burnup_data()
 
     # Forumlating data json object
-    data = {
+    record = {
+        "date": timestamp,
         "cards_done": cards_done,
         "cards_total": cards_total
     }
 
-    # Inserting into existing data at the timestamp
-    burnup_data[timestamp] = data
+    # Leaving the file alone if this run has nothing new to record
+    if load_last_burnup_record() == record:
+        return False
+
+    # Appending the record as a single line, leaving prior days untouched
+    with open(BURNUP_DATA_FILE, "a") as f:
+        f.write(orjson.dumps(record).decode() + "\n")
 
-    # Dumping burnup_data to the json file
-    with open("burnup_data.json", "w") as f:
-        json.dump(burnup_data, f, indent=2, sort_keys=True)
+    return True
 
 
 def get_burnup_stats():
@@ -104,6 +132,7 @@ def get_burnup_stats():
     Retrieves the burnup data and attempts to generate stats for the burnup chart.
     If not enough data is present, an error is thrown. Returns a pandas dataframe.
     """
+    import pandas as pd
 
     # Getting burnup_data
     burnup_data = load_burnup_data()
@@ -112,70 +141,148 @@ def get_burnup_stats():
     if len(burnup_data) < 1:
         raise ValueError("Burnup Data has length %d. Expected length of at least 1." % len(burnup_data))
 
-    # Collecting lists of stats
-    scope_list = []
-    done_list = []
-    dates_list = []
-
-    # Sorting date keys from the burnup data json object
-    sorted_date_keys = sorted(list(burnup_data.keys()))
-    for date in sorted_date_keys:
-        # Getting data at the date/key location and putting data
-        # into the appropriate stat lists
-        data = burnup_data[date]
-        scope_list.append(data["cards_total"])
-        done_list.append(data["cards_done"])
-        dates_list.append(datetime.datetime.strptime(date, "%Y-%m-%d"))
-
-    # Populating/creating the stats dataframe
-    dataframe = pd.DataFrame({
-        "scope": scope_list,
-        "done": done_list,
-        "dates": dates_list
-    })
+    # Flattening the burnup data into (date, done, scope) records
+    records = [(date, data["cards_done"], data["cards_total"]) for date, data in burnup_data.items()]
+
+    # Populating/creating the stats dataframe and parsing the dates in one vectorized pass
+    dataframe = pd.DataFrame.from_records(records, columns=["dates", "done", "scope"]).astype(
+        {"done": "int32", "scope": "int32"})
+    dataframe["dates"] = pd.to_datetime(dataframe["dates"], format="%Y-%m-%d", cache=True)
+
+    # Records are appended in date order, so only sort if the history was written out of order
+    if not dataframe["dates"].is_monotonic_increasing:
+        dataframe.sort_values("dates", inplace=True, ignore_index=True)
 
     return dataframe
 
 
 def load_burnup_data():
-    """Loads burnup_data.json and returns a dict object with the data"""
+    """
+    Loads burnup_data.jsonl and returns a dict object with the data keyed by date.
+    If a date was recorded more than once, the last record for it wins.
+    """
+
+    # Carrying over any history from the old burnup_data.json store
+    migrate_burnup_data()
 
-    # Creating burnup_data.json if it doesn't exist
-    if not path.exists("burnup_data.json"):
-        with open("burnup_data.json", "w") as f:
-            f.write("{}")
+    burnup_data = {}
+    if not path.exists(BURNUP_DATA_FILE):
+        return burnup_data
 
-    # Loading burnup data from json
-    with open("burnup_data.json") as f:
-        burnup_data = json.load(f)
+    # Streaming burnup data records from jsonl
+    with open(BURNUP_DATA_FILE) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            burnup_data[record["date"]] = {
+                "cards_done": record["cards_done"],
+                "cards_total": record["cards_total"]
+            }
 
     return burnup_data
 
 
-def render_burnup_chart(stats_df, save_loc, regression_amount):
-    """Takes in a Pandas dataframe, produces the burnup chart, and saves it in the specified location"""
+def load_last_burnup_record():
+    """Returns the last record in burnup_data.jsonl as a dict, or None if there are no records"""
 
-    fig, ax = plt.subplots()
-    timestamp = get_timestamp()
+    if not path.exists(BURNUP_DATA_FILE):
+        return None
+
+    # Reading only the tail of the file, which is enough to hold the last record
+    with open(BURNUP_DATA_FILE, "rb") as f:
+        f.seek(0, 2)
+        f.seek(max(0, f.tell() - 1024))
+        lines = f.read().splitlines()
+
+    for line in reversed(lines):
+        if line.strip():
+            return orjson.loads(line)
+
+    return None
+
+
+def migrate_burnup_data():
+    """Converts an old burnup_data.json file into burnup_data.jsonl if the latter doesn't exist yet"""
+
+    if path.exists(BURNUP_DATA_FILE) or not path.exists(LEGACY_BURNUP_DATA_FILE):
+        return
+
+    logger.info("Migrating %s to %s" % (LEGACY_BURNUP_DATA_FILE, BURNUP_DATA_FILE))
+    with open(LEGACY_BURNUP_DATA_FILE, "rb") as f:
+        legacy_data = orjson.loads(f.read())
+
+    with open(BURNUP_DATA_FILE, "w") as f:
+        for date in sorted(legacy_data):
+            record = {
+                "date": date,
+                "cards_done": legacy_data[date]["cards_done"],
+                "cards_total": legacy_data[date]["cards_total"]
+            }
+            f.write(orjson.dumps(record).decode() + "\n")
+
+
+# Figure kept between renders so repeated charts don't each pay for a new figure and canvas
+burnup_figure = None
+
+
+@functools.lru_cache(maxsize=None)
+def configure_plotting():
+    """Imports and configures matplotlib for rendering. Only does any work on the first call."""
+    import matplotlib
+    matplotlib.use("Agg")  # Charts are only ever saved to disk, so skip any interactive backend
+    from matplotlib import pyplot as plt
+    from pandas.plotting import register_matplotlib_converters
+    register_matplotlib_converters()
+
+    # Coalescing nearly collinear line segments when rendering
+    plt.rcParams["path.simplify"] = True
+    plt.rcParams["path.simplify_threshold"] = 1.0
+
+
+def render_burnup_chart(stats_df, save_loc, regression_amount, timestamp):
+    """
+    Takes in a Pandas dataframe, produces the burnup chart, and saves it in the specified location.
+    The timestamp is used for the chart title and file name so both match the recorded data.
+    """
+    configure_plotting()
+    import numpy as np
+    import pandas as pd
+    from matplotlib import dates as mdates
+    from matplotlib import pyplot as plt
+    from matplotlib import ticker as ticker
+
+    # Reusing the figure from any previous render rather than building a new one each time
+    global burnup_figure
+    if burnup_figure is None:
+        burnup_figure = plt.figure()
+    fig = burnup_figure
+    fig.clf()
+    ax = fig.add_subplot(111)
+
+    # Pulling the columns out once rather than indexing the series repeatedly
+    n = len(stats_df)
+    last = n - 1
+    dates = stats_df["dates"].to_numpy()
+    done = stats_df["done"].to_numpy(dtype=np.int64)
+    scope = stats_df["scope"].to_numpy()
 
     # Toggles visibility of vertical lines for dates
     ax.xaxis.grid()
 
     # Predicting best/likely/worst predictions of completion date
-    stats_dates = mdates.date2num(list(
-        map(lambda x: x.to_pydatetime(), stats_df["dates"])))  # Converting dataframe values to numpy-readable values
-    stats_done = list(map(int, stats_df["done"]))
+    stats_dates = mdates.date2num(dates)  # Converting datetime64 values to matplotlib date numbers
 
     # Drawing best fit line if more than one point available
-    if len(stats_df["dates"]) > 1:
+    if n > 1:
         # Best-case linear prediction on last 4 periods (if available)
-        fit_pred = np.polyfit(stats_done[-regression_amount:], stats_dates[-regression_amount:], 1)
+        fit_pred = np.polyfit(done[-regression_amount:], stats_dates[-regression_amount:], 1)
         fit_func = np.poly1d(fit_pred)
 
         # Predicting the time when the "Done" line reaches the current level of the "Scope" line
-        curr_scope = stats_df["scope"][len(stats_df["scope"]) - 1]
-        curr_done = stats_df["done"][len(stats_df["done"]) - 1]
-        curr_date = stats_df["dates"][len(stats_df["dates"]) - 1]
+        curr_scope = scope[last]
+        curr_done = done[last]
+        curr_date = pd.Timestamp(dates[last])
         finish_date = mdates.num2date(fit_func(curr_scope)).replace(
             tzinfo=None)  # Removing timezone info after conversion to python datetime
 
@@ -183,15 +290,15 @@ def render_burnup_chart(stats_df, save_loc, regression_amount):
         fit_line_x = [curr_date, finish_date]
         fit_line_y = [curr_done, curr_scope]
 
-        plt.plot(fit_line_x, fit_line_y, linewidth=3, markersize=10, color="#2ca02c", linestyle='dashed', label="Predicted")
+        ax.plot(fit_line_x, fit_line_y, linewidth=3, markersize=10, color="#2ca02c", linestyle='dashed', label="Predicted")
 
         # Drawing continuation of the scope line
         cont_line_x = [curr_date, finish_date]
         cont_line_y = [curr_scope, curr_scope]
-        plt.plot(cont_line_x, cont_line_y, linewidth=3, marker="o", markersize=10, color="#1f77b4", label=None)
+        ax.plot(cont_line_x, cont_line_y, linewidth=3, marker="o", markersize=10, color="#1f77b4", label=None)
 
         # Annotating the finish date
-        plt.text(0.97, 0.05,"Est. Finish Date: %s" % finish_date.strftime("%b %d"),
+        ax.text(0.97, 0.05,"Est. Finish Date: %s" % finish_date.strftime("%b %d"),
             horizontalalignment="right",
             verticalalignment="center",
             color="#2ca02c",
@@ -202,52 +309,51 @@ def render_burnup_chart(stats_df, save_loc, regression_amount):
 
     # Turning off x-axis ticks and displaying x-axis title
     ax.get_yaxis().set_ticks([])
-    plt.ylabel("Tasks")
+    ax.set_ylabel("Tasks")
 
     # Drawing the title
-    plt.title("Burnup Chart %s" % get_timestamp())
-
-    plt.plot("dates", "scope", data=stats_df, linewidth=3, marker="o", markersize=10, label="Scope")
-    plt.plot("dates", "done", data=stats_df, linewidth=3, marker="o", markersize=10, label="Done")
-    plt.legend()
+    ax.set_title("Burnup Chart %s" % timestamp)
+
+    # Drawing both lines from one (N, 2) array and the points as a single scatter collection per series
+    scope_line, done_line = ax.plot(dates, np.column_stack([scope, done]), linewidth=3)
+    scope_line.set_label("Scope")
+    scope_line.set_color("#1f77b4")
+    done_line.set_label("Done")
+    done_line.set_color("#ff7f0e")
+    ax.scatter(dates, scope, s=100, color="#1f77b4", zorder=3)
+    ax.scatter(dates, done, s=100, color="#ff7f0e", zorder=3)
+    ax.legend()
 
     # Increasing y-axis max by 8% and x-axis max by 4% to make room for annotations
-    ybottom, ytop = plt.ylim()
-    xbottom, xtop = plt.xlim()
-    plt.ylim((ybottom, ytop * 1.08))
-    plt.xlim((xbottom, xtop))
+    ybottom, ytop = ax.get_ylim()
+    xbottom, xtop = ax.get_xlim()
+    ax.set_ylim((ybottom, ytop * 1.08))
+    ax.set_xlim((xbottom, xtop))
 
     # Annotating the points with the value
     # Getting number of points to jump when drawing the number on a point
     jumpNum = 1
-    if len(stats_df["dates"]) > 5:
-        jumpNum = int(len(stats_df["dates"])/5)
-    # Putting done numbers on graph
-    for i in range(0, len(stats_df["dates"]), jumpNum):
-        date = stats_df["dates"][i]
-        done_num = stats_df["done"][i]
-        scope_num = stats_df["scope"][i]
-        # If we're within a jump to the last point,
-        # Make the last point's annotation larger
-        if (i+jumpNum) > (len(stats_df["dates"]) - 1):
-            date = stats_df["dates"][len(stats_df["dates"]) - 1]
-            done_num = stats_df["done"][len(stats_df["done"]) - 1]
-            scope_num = stats_df["scope"][len(stats_df["scope"]) - 1]
-            ax.annotate(done_num, xy=(date, done_num), xytext=(-5, 9), textcoords='offset points', weight="bold",
-                        ha='center', color="#ff7f0e", size=18)
-            ax.annotate(scope_num, xy=(date, scope_num), xytext=(-5, 9), textcoords='offset points', weight="bold",
-                        ha='center', color="#1f77b4", size=18)
-            break
-        else:
-            ax.annotate(done_num, xy=(date, done_num), xytext=(-5, 9), textcoords='offset points', weight="bold",
-                        ha='center', color="#ff7f0e", size=13)
-            ax.annotate(scope_num, xy=(date, scope_num), xytext=(-5, 9), textcoords='offset points', weight="bold",
-                        ha='center', color="#1f77b4", size=13)
+    if n > 5:
+        jumpNum = int(n/5)
+    # Picking every jumpNum-th point, swapping the last pick for the final point
+    annotate_idxs = list(range(0, n, jumpNum))
+    annotate_idxs[-1] = last
+
+    # Putting done numbers on graph, making the last point's annotation larger
+    for i in annotate_idxs:
+        date = dates[i]
+        done_num = done[i]
+        scope_num = scope[i]
+        size = 18 if i == last else 13
+        ax.annotate(done_num, xy=(date, done_num), xytext=(-5, 9), textcoords='offset points', weight="bold",
+                    ha='center', color="#ff7f0e", size=size)
+        ax.annotate(scope_num, xy=(date, scope_num), xytext=(-5, 9), textcoords='offset points', weight="bold",
+                    ha='center', color="#1f77b4", size=size)
 
     # Setting x-axis dates to three letter month + date format
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %d'))
-    if len(stats_df["dates"]) > 1:
-        days_between = int((stats_df["dates"][len(stats_df["dates"])-1] - stats_df["dates"][0]).days)
+    if n > 1:
+        days_between = int((dates[last] - dates[0]) // np.timedelta64(1, "D"))
         if days_between > 32:
             # Tigther tick rate
             ax.xaxis.set_major_locator(ticker.MultipleLocator(days_between/4))
@@ -260,13 +366,13 @@ def render_burnup_chart(stats_df, save_loc, regression_amount):
         ax.xaxis.set_major_locator(ticker.MultipleLocator(1200))
 
     # Packing layout
-    plt.tight_layout()
+    fig.tight_layout()
 
     # Saving plot
     if not save_loc == "" and not path.exists(save_loc):
         makedirs(save_loc)
 
-    burnup_save_loc = path.join(save_loc, 'burnup-%s.png' % timestamp)
+    burnup_save_loc = get_burnup_save_loc(save_loc, timestamp)
 
-    plt.savefig(burnup_save_loc, dpi=150)
-    plt.close()
+    # 100 dpi with light PNG compression keeps encoding fast for a dashboard-sized chart
+    fig.savefig(burnup_save_loc, dpi=100, pil_kwargs={"compress_level": 1})
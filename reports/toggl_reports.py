@@ -1,4 +1,6 @@
-import json
+import io
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from toggl.TogglPy import Toggl
 from os import path, makedirs
 import getopt
@@ -8,6 +10,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent per-user report downloads
+MAX_DOWNLOAD_WORKERS = 16
+
 team_report_template = """
 
 ---
@@ -33,9 +38,22 @@ def user_weekly_report(directory, since, until, api_key, users, workspace):
     toggl = Toggl()
     toggl.setAPIKey(api_key)
 
-    for uid, name in users.items():
-        logger.info("Downloading reports for {}".format(name))
-        name = users[uid]
+    if not users:
+        return
+
+    # Each user's downloads are independent network calls, so run them concurrently
+    with ThreadPoolExecutor(max_workers=min(MAX_DOWNLOAD_WORKERS, len(users))) as executor:
+        list(executor.map(lambda user: download_user_reports(toggl, directory, since, until, workspace, *user),
+                          users.items()))
+
+
+def download_user_reports(toggl, directory, since, until, workspace, uid, name):
+    """
+    Downloads a single user's summary and details pdf into their own directory.
+    Errors are logged rather than raised so one user's failure doesn't stop the others.
+    """
+    logger.info("Downloading reports for {}".format(name))
+    try:
         data = {
             'workspace_id': workspace,  # see the next example for getting a workspace id
             'since': since,
@@ -47,18 +65,17 @@ def user_weekly_report(directory, since, until, api_key, users, workspace):
 
         if not path.exists(folder):
             logger.info("Creating the folder {}".format(folder))
-            makedirs(folder)
+            makedirs(folder, exist_ok=True)
 
         details = path.join(folder, until + "-details.pdf")
         summary = path.join(folder, until + "-summary.pdf")
 
-        try:
-            toggl.getDetailedReportPDF(data, details)
-            logger.info("Downloaded {}".format(details))
-            toggl.getSummaryReportPDF(data, summary)
-            logger.info("Downloaded {}".format(summary))
-        except Exception as e:
-            logging.error(e)
+        toggl.getDetailedReportPDF(data, details)
+        logger.info("Downloaded {}".format(details))
+        toggl.getSummaryReportPDF(data, summary)
+        logger.info("Downloaded {}".format(summary))
+    except Exception as e:
+        logging.error(e)
 
 
 def team_weekly_report(destination, since, until, api_key, workspace):
@@ -85,15 +102,18 @@ def team_weekly_report(destination, since, until, api_key, workspace):
     else:
         time_str = "Total team hours: No hours recorded"
 
-    # Find all project worked on
-    items_worked_on = [item["title"]["time_entry"] for project in result["data"] for item in project["items"]]
-    if len(items_worked_on) == 0:
-        items_worked_on = ["No tasks worked on for this time period"]
+    # Find all project worked on, formatting them as a markdown list in a single pass
+    items_buffer = io.StringIO()
+    for project in result["data"]:
+        for item in project["items"]:
+            items_buffer.write("- ")
+            items_buffer.write(item["title"]["time_entry"])
+            items_buffer.write("\n")
+    formatted_items = items_buffer.getvalue().rstrip("\n") or "- No tasks worked on for this time period"
 
     # Calculate the pretty data for the start of the week
-    date = datetime.strptime(since, "%Y-%m-%d")
+    date = datetime.fromisoformat(since)
     formatted_week = date.strftime("%B %d")
-    formatted_items = "- " + "\n- ".join(items_worked_on)
     formatted_team_report = team_report_template.format(formatted_week, formatted_items, time_str)
 
     logger.info("Created team report:")
@@ -130,8 +150,8 @@ if __name__ == '__main__':
 
     env_file = path.join(path.dirname(path.realpath(__file__)), '.env')
 
-    with open(env_file) as ef:
-        env = json.load(ef)
+    with open(env_file, "rb") as ef:
+        env = orjson.loads(ef.read())
 
     # user_weekly_report(f, s, u, env["toggl_api_key"], env["toggl_users"], env["toggl_workspace"])
     team_weekly_report(f, s, u, env["toggl_api_key"], env["toggl_workspace"])
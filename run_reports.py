@@ -1,5 +1,4 @@
 import getopt
-import json
 import logging
 import sys
 import traceback
@@ -7,6 +6,8 @@ from datetime import datetime, timedelta
 from logging.handlers import RotatingFileHandler
 from os import path
 
+import orjson
+
 from reports import user_weekly_report, team_weekly_report, generate_burnup_chart
 
 # Logger constants
@@ -52,8 +53,8 @@ def main(directory, since, until, board_name, regression_amount):
         # Checking env variables are present
         if path.isfile(".env"):
             # Loading keys and IDs
-            with open('.env') as f:
-                env = json.load(f)
+            with open('.env', 'rb') as f:
+                env = orjson.loads(f.read())
         else:
             raise OSError("Environment file could not be found. Please make sure to copy the example and fill it out.")
 